@@ -24,6 +24,13 @@ class JsonConstants(Enum):
     TEMPLATE = "template"
 
 
+class NpyLz4Constants(Enum):
+    """NpyLz4Constants
+    Constants associated to LZ4 compressed NPY data
+    """
+    SUFFIX = ".npy.lz4"
+
+
 class PngConstants(Enum):
     """PngConstants
     Constants associated to PNG data
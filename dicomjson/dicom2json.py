@@ -1,27 +1,94 @@
 #!/usr/bin/env python3
 
 import argparse
-from dataclasses import dataclass
-import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+import gc
+import io
+from itertools import count
 import logging
-from logging import config
+from logging.handlers import QueueHandler, QueueListener
+import multiprocessing
+import os
 from pathlib import Path
+from typing import NamedTuple
 import cv2
 import numpy as np
-import yaml
+import orjson
 from pydicom import dcmread
+from pydicom.datadict import tag_for_keyword
 from pydicom.errors import InvalidDicomError
-from constants import DicomConstants, JsonConstants, PngConstants
+from pydicom.tag import Tag
+from constants import DicomConstants, JsonConstants, NpyLz4Constants, PngConstants
+from logger_config import load_logger_config
+try:
+    # Optional SIMD PNG encoder, much faster than libpng used by cv2
+    import fpnge
+except ImportError:
+    fpnge = None
+try:
+    # Optional, needed by the 'npy-lz4' image format
+    import lz4.frame
+except ImportError:
+    lz4 = None
 
 DEFAULT_OUTPUT_DIR = Path(__file__).parent / Path("output")
+# Output filepaths are built as strings, once per converted file
+_OUT_DIR_STR = str(DEFAULT_OUTPUT_DIR)
+# Streamed JSON fragments are gathered in this buffer before write() syscalls
+JSON_WRITE_BUFFER_SIZE = 1 << 20
+DEFAULT_PNG_COMPRESSION = 1
+PNG_BACKENDS = ("cv2", "fpnge")
+DEFAULT_PNG_BACKEND = "cv2"
+IMAGE_FORMATS = ("png", "npy-lz4")
+DEFAULT_IMAGE_FORMAT = "png"
+# Values bigger than this are only read from the file when accessed
+DEFAULT_DEFER_SIZE = "4 KB"
+# DICOM fields always read, they are needed to extract the image
+IMAGE_DICOM_FIELDS = ("Rows", "Columns", "BitsStored", "PixelData")
+# Tags of IMAGE_DICOM_FIELDS, to skip the keyword lookup for each file
+_ROWS_TAG = 0x00280010
+_COLUMNS_TAG = 0x00280011
+_BITS_STORED_TAG = 0x00280101
+_PIXEL_DATA_TAG = 0x7FE00010
+# Image data type by BitsStored value
+IMAGE_DTYPES = {8: np.uint8, 16: np.uint16}
 
 # Load logger configuration from YAML file
-with open(Path(__file__).parent / Path("logger_config.yaml"), 'rt') as f:
-    config_data = yaml.safe_load(f.read())
-    config.dictConfig(config_data)
+load_logger_config()
 # Get basic logger
 logger = logging.getLogger('root')
 
+# Image file is written in background, while the dataset JSON file is written.
+# Each conversion waits for its image before returning, so a process never
+# has more than one write in flight
+_io_pool = ThreadPoolExecutor(max_workers=1)
+
+# pydicom leaves reference cycles behind, they are collected every
+# GC_COLLECT_INTERVAL files converted by a process
+GC_COLLECT_INTERVAL = 100
+_converted_files_count = count(1)
+
+
+def _json_default(obj):
+    """_json_default
+    Serialize values orjson does not handle natively.
+    pydicom DS values (DSfloat) are float subclasses, which orjson rejects
+
+    Arguments:
+        obj {object} -- Value to serialize
+
+    Raises:
+        TypeError: Value cannot be serialized
+
+    Returns:
+        float -- Value as a plain float
+    """
+    if isinstance(obj, float):
+        return float(obj)
+    raise TypeError("Type is not JSON serializable: {}".format(
+        type(obj).__name__))
+
 
 def my_json_dumps(data):
     """my_json_dumps
@@ -31,106 +98,339 @@ def my_json_dumps(data):
         data {str} -- Data to JSON beautify
 
     Returns:
-        str -- Data beautified
+        bytes -- Data beautified, UTF-8 encoded
+    """
+    return orjson.dumps(data, default=_json_default,
+                        option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS)
+
+
+def _write_bytes(filepath, data):
+    """_write_bytes
+    Write data to a file with raw os.write() calls, without Python buffering.
+    Meant for content already in memory, usually written in one syscall
+
+    Arguments:
+        filepath {str} -- File location
+        data {bytes} -- Data to write, any bytes-like object
+    """
+    data = memoryview(data).cast("B")
+    fd = os.open(filepath,
+                 os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0),
+                 0o666)
+    try:
+        while data:
+            data = data[os.write(fd, data):]
+    finally:
+        os.close(fd)
+
+
+def _iter_json_elements(dicom_dataset):
+    """_iter_json_elements
+    Serialize DICOM data elements one by one, in tag order
+
+    Arguments:
+        dicom_dataset {Dataset} -- pydicom dataset to serialize
+
+    Yields:
+        tuple -- JSON key and JSON value of each data element, as bytes
+    """
+    for data_element in dicom_dataset:
+        element_json = data_element.to_json_dict(
+            bulk_data_element_handler=None, bulk_data_threshold=1024)
+        yield '"{:08X}"'.format(data_element.tag).encode(), my_json_dumps(element_json)
+
+
+def write_json_datasets(json_file, json_datasets):
+    """write_json_datasets
+    Stream DICOM datasets to a JSON object, without building its dict.
+    Output layout is the same as my_json_dumps
+
+    Arguments:
+        json_file {file} -- Binary file object to write in
+        json_datasets {dict} -- pydicom datasets by JSON field name
+    """
+    json_file.write(b"{")
+    for dataset_index, dataset_name in enumerate(sorted(json_datasets)):
+        if dataset_index:
+            json_file.write(b",")
+        json_file.write(b'\n  "' + dataset_name.encode() + b'": {')
+        has_elements = False
+        for json_key, json_value in _iter_json_elements(json_datasets[dataset_name]):
+            if has_elements:
+                json_file.write(b",")
+            has_elements = True
+            # Elements are nested two levels deep in the output object.
+            # Separate writes avoid copying big values (InlineBinary) again
+            json_file.write(b"\n    ")
+            json_file.write(json_key)
+            json_file.write(b": ")
+            json_file.write(json_value.replace(b"\n", b"\n    "))
+        json_file.write(b"\n  }" if has_elements else b"}")
+    json_file.write(b"\n}")
+
+
+def write_json_array(json_file, json_items):
+    """write_json_array
+    Stream items to a JSON array, without building the list.
+    Output layout is the same as my_json_dumps
+
+    Arguments:
+        json_file {file} -- Binary file object to write in
+        json_items {iterable} -- Items to serialize
+    """
+    json_file.write(b"[")
+    has_items = False
+    for json_item in json_items:
+        if has_items:
+            json_file.write(b",")
+        has_items = True
+        # Items are nested one level deep in the output array
+        json_file.write(b"\n  ")
+        json_file.write(my_json_dumps(json_item).replace(b"\n", b"\n  "))
+    json_file.write(b"\n]" if has_items else b"]")
+
+
+def _get_value(dicom_dataset, dicom_tag):
+    """_get_value
+    Get a DICOM field value by tag, without keyword lookup
+
+    Arguments:
+        dicom_dataset {Dataset} -- pydicom dataset
+        dicom_tag {int} -- DICOM field tag
+
+    Returns:
+        object -- DICOM field value, None if the field is missing
     """
-    return json.dumps(data, indent=2, sort_keys=True)
+    data_element = dicom_dataset.get(dicom_tag)
+    return data_element.value if data_element is not None else None
 
 
-@dataclass
-class DicomConvertedData:
+def check_pixel_data(pixel_data_length, rows, columns, bits_stored):
+    """check_pixel_data
+    Check PixelData buffer size and find the image data type
+
+    Arguments:
+        pixel_data_length {int} -- PixelData buffer size, in bytes
+        rows {int} -- Image rows count
+        columns {int} -- Image columns count
+        bits_stored {int} -- Bits stored by pixel
+
+    Raises:
+        ValueError: Unrecognized BitsStored value
+
+    Returns:
+        tuple -- Buffer size is consistent and image data type
+    """
+    img_dtype = IMAGE_DTYPES.get(bits_stored)
+    if img_dtype is None:
+        bits_stored_error = "Unrecognized DICOM BitsStored value '{}'".format(
+            bits_stored)
+        raise ValueError(bits_stored_error)
+    pixel_data_expected_length = rows * columns * (bits_stored >> 3)
+    return pixel_data_length == pixel_data_expected_length, img_dtype
+
+
+def encode_png(image, png_compression=DEFAULT_PNG_COMPRESSION,
+               png_backend=DEFAULT_PNG_BACKEND):
+    """encode_png
+    Encode an image to PNG in memory.
+    The fpnge backend only accepts 8 bits images
+
+    Arguments:
+        image {ndarray} -- Image to encode
+        png_compression {int} -- PNG compression level, from 0 to 9 (cv2 only)
+        png_backend {str} -- PNG encoder, one of PNG_BACKENDS
+
+    Raises:
+        ValueError: Image cannot be encoded, or is not 8 bits with fpnge
+
+    Returns:
+        bytes-like -- PNG file content: bytes with fpnge, uint8 ndarray with cv2
+    """
+    if png_backend == "fpnge":
+        if image.dtype.itemsize != 1:
+            fpnge_error = "'fpnge' PNG backend only supports 8 bits images, not {} bits, use 'cv2' instead".format(
+                8 * image.dtype.itemsize)
+            raise ValueError(fpnge_error)
+        # fpnge expects a (rows, columns, channels) array
+        return fpnge.fromNP(image.reshape(image.shape + (1,)))
+
+    image_encoded, image_buffer = cv2.imencode(
+        PngConstants.SUFFIX.value,
+        image,
+        [cv2.IMWRITE_PNG_COMPRESSION, png_compression,
+         cv2.IMWRITE_PNG_STRATEGY, cv2.IMWRITE_PNG_STRATEGY_DEFAULT])  # pylint: disable=E1101
+    if not image_encoded:
+        raise ValueError("Cannot encode image to PNG")
+    return image_buffer
+
+
+def shuffle_bytes(image):
+    """shuffle_bytes
+    Split a multi-byte image in byte planes, like the HDF5 shuffle filter.
+    Least significant bytes are stored first, then the next ones: high bytes
+    change slowly and compress much better once grouped together
+
+    Arguments:
+        image {ndarray} -- Image to shuffle, with shape (rows, columns)
+
+    Returns:
+        ndarray -- uint8 byte planes with shape (itemsize, rows, columns),
+                   or image itself if it is 8 bits
+    """
+    if image.dtype.itemsize == 1:
+        return image
+    image = image.astype(image.dtype.newbyteorder("<"), copy=False)
+    return np.ascontiguousarray(
+        image.view(np.uint8).reshape(image.shape + (image.dtype.itemsize,)).transpose(2, 0, 1))
+
+
+def encode_npy_lz4(image):
+    """encode_npy_lz4
+    Encode an image to a LZ4 compressed NPY file in memory.
+    Much faster than PNG, but only readable with numpy (see json2dicom.py).
+    Multi-byte images are stored as byte planes (see shuffle_bytes)
+
+    Arguments:
+        image {ndarray} -- Image to encode
+
+    Returns:
+        bytes -- LZ4 compressed NPY file content
+    """
+    npy_buffer = io.BytesIO()
+    np.save(npy_buffer, shuffle_bytes(image))
+    return lz4.frame.compress(npy_buffer.getbuffer(),
+                              compression_level=lz4.frame.COMPRESSIONLEVEL_MIN)
+
+
+class DicomConvertedData(NamedTuple):
     """Class for keeping track of converted DICOM items"""
     image: str
     output: str
     template: str
 
 
-def convert_dicom_to_data(input_file, remove_dicom_fields, converted_data):
+def dicom_fields_to_tags(dicom_field_names):
+    """dicom_fields_to_tags
+    Resolve DICOM field names to tags, unknown names are skipped
+
+    Arguments:
+        dicom_field_names {list} -- DICOM field names (see '_dicom_dict.py')
+
+    Returns:
+        dict -- DICOM field name by tag
+    """
+    dicom_tags = {}
+    for dicom_field_name in dicom_field_names or []:
+        dicom_tag = tag_for_keyword(dicom_field_name)
+        if dicom_tag is None:
+            dicom_error = "Unrecognized DICOM field named '{}'".format(
+                dicom_field_name)
+            logger.warning(dicom_error)
+        else:
+            dicom_tags[dicom_tag] = dicom_field_name
+    return dicom_tags
+
+
+def convert_dicom_to_data(input_file, remove_dicom_tags,
+                          png_compression=DEFAULT_PNG_COMPRESSION,
+                          keep_dicom_tags=None,
+                          png_backend=DEFAULT_PNG_BACKEND,
+                          image_format=DEFAULT_IMAGE_FORMAT):
     """
     Convert DICOM file to JSON using pydicom library
 
     Arguments:
         input_file {str} -- DICOM file location
-        remove_dicom_fields {list} -- DICOM field name to not save in JSON
-        converted_data {list} -- DicomConvertedData items list
+        remove_dicom_tags {dict} -- DICOM field name by tag, to not save in JSON
+        png_compression {int} -- PNG compression level, from 0 to 9
+        keep_dicom_tags {list} -- Only DICOM tags read from the file, all if None
+        png_backend {str} -- PNG encoder, one of PNG_BACKENDS
+        image_format {str} -- Image file format, one of IMAGE_FORMATS
+
+    Returns:
+        DicomConvertedData -- Converted DICOM item
     """
     try:
-        dicom_dataset = dcmread(str(input_file))
+        logger.debug("Convert %s", str(input_file.resolve()))
+        dicom_dataset = dcmread(str(input_file),
+                                defer_size=DEFAULT_DEFER_SIZE,
+                                specific_tags=keep_dicom_tags)
 
         # Extract DICOM data
-        rows = dicom_dataset.get('Rows')
-        columns = dicom_dataset.get('Columns')
-        pixel_data = dicom_dataset.get('PixelData')
-        bits_stored = dicom_dataset.get('BitsStored')
-        pixel_data_length = None
-        pixel_data_expected_length = None
-        if pixel_data and rows and columns and bits_stored:
-            pixel_data_length = len(pixel_data)
-            pixel_data_expected_length = rows * columns * (bits_stored / 8)
+        rows = _get_value(dicom_dataset, _ROWS_TAG)
+        columns = _get_value(dicom_dataset, _COLUMNS_TAG)
+        pixel_data = _get_value(dicom_dataset, _PIXEL_DATA_TAG)
+        bits_stored = _get_value(dicom_dataset, _BITS_STORED_TAG)
+        has_image = bool(pixel_data and rows and columns and bits_stored)
 
         # Format output filepath
-        output_filepath = (DEFAULT_OUTPUT_DIR / input_file.stem)
-        output_dataset_filepath = output_filepath.with_suffix(
-            JsonConstants.SUFFIX.value)
-        output_image_filepath = output_filepath.with_suffix(
-            PngConstants.SUFFIX.value)
+        output_filepath = os.path.join(_OUT_DIR_STR, input_file.stem)
+        output_dataset_filepath = output_filepath + JsonConstants.SUFFIX.value
+        output_image_filepath = output_filepath + (
+            NpyLz4Constants.SUFFIX.value if image_format == "npy-lz4" else PngConstants.SUFFIX.value)
 
         # Remove DICOM fields specified by the user
-        if remove_dicom_fields:
-            for dicom_fields_name in remove_dicom_fields:
-                if dicom_dataset.get(dicom_fields_name):
-                    dicom_dataset.pop(dicom_fields_name)
+        if remove_dicom_tags:
+            for dicom_tag, dicom_field_name in remove_dicom_tags.items():
+                if dicom_tag in dicom_dataset:
+                    del dicom_dataset[dicom_tag]
                 else:
-                    dicom_error = "Unrecognized DICOM field named '{}'".format(
-                        dicom_fields_name)
-                    logger.warning(dicom_error)
-
-        # Write dataset JSON file
-        dicom_dataset_to_json_meta = dicom_dataset.file_meta.to_json_dict()
-        dicom_dataset_to_json = dicom_dataset.to_json_dict()
-        dicom_json_file = open(str(output_dataset_filepath), "w")
-        dicom_json_file.write(my_json_dumps(
-            {
-                JsonConstants.META.value: dicom_dataset_to_json_meta,
-                JsonConstants.DATA.value: dicom_dataset_to_json
-            }))
-        dicom_json_file.close()
+                    logger.warning("%s has no DICOM field named '%s'",
+                                   str(input_file.resolve()), dicom_field_name)
 
         # Create image only if Rows, Columns, BitsStored and PixelData are filled
-        if rows and columns and pixel_data and bits_stored:
-            # Extract image from PixelData DICOM file
-            img_dtype = None
-            if bits_stored == 8:
-                img_dtype = np.uint8
-            elif bits_stored == 16:
-                img_dtype = np.uint16
-            else:
-                bits_stored_error = "Unrecognized DICOM BitsStored value '{}'".format(
-                    bits_stored)
-                raise ValueError(bits_stored_error)
-
-            # Check buffer size consistancy
-            if not pixel_data_length == int(pixel_data_expected_length):
+        image_write = None
+        if has_image:
+            # Check buffer size consistancy and extract image data type
+            pixel_data_consistent, img_dtype = check_pixel_data(
+                len(pixel_data), rows, columns, bits_stored)
+            if not pixel_data_consistent:
                 logger.error("%s buffer size is not consistent",
                              str(input_file.resolve()))
-                converted_data.append(DicomConvertedData(
-                    None, input_file.name, str(output_dataset_filepath)))
-                return
-
-            # Write image PNG file
-            dicom_image = np.ndarray((rows, columns),
-                                     img_dtype,
-                                     pixel_data)
-            cv2.imwrite(str(output_image_filepath),
-                        dicom_image)  # pylint: disable=E1101
-
-            # Add full data in the main list
-            converted_data.append(DicomConvertedData(
-                str(output_image_filepath), input_file.name, str(output_dataset_filepath)))
+            else:
+                # Encode image file, then write it in background
+                dicom_image = np.frombuffer(pixel_data,
+                                            dtype=img_dtype,
+                                            count=rows * columns).reshape(rows, columns)
+                if image_format == "npy-lz4":
+                    image_buffer = encode_npy_lz4(dicom_image)
+                else:
+                    image_buffer = encode_png(
+                        dicom_image, png_compression, png_backend)
+                image_write = _io_pool.submit(
+                    _write_bytes, output_image_filepath, image_buffer)
+                # dicom_image is a view over pixel_data: drop it so the
+                # PixelData release after the JSON write frees the buffer
+                del dicom_image
         else:
             logger.warning("%s has no Rows or Columns or BitsStored or PixelData DICOM fields", str(
                 input_file.resolve()))
-            converted_data.append(DicomConvertedData(
-                None, input_file.name, str(output_dataset_filepath)))
+
+        # Write dataset JSON file
+        dicom_json_file = open(output_dataset_filepath, "wb",
+                               buffering=JSON_WRITE_BUFFER_SIZE)
+        write_json_datasets(dicom_json_file,
+                            {
+                                JsonConstants.META.value: dicom_dataset.file_meta,
+                                JsonConstants.DATA.value: dicom_dataset
+                            })
+        dicom_json_file.close()
+
+        # Release the dataset and its PixelData before waiting for the
+        # image file
+        del dicom_dataset, pixel_data
+        if next(_converted_files_count) % GC_COLLECT_INTERVAL == 0:
+            gc.collect()
+
+        if image_write is None:
+            return DicomConvertedData(
+                None, input_file.name, output_dataset_filepath)
+
+        # Wait for the image file, write errors are raised here
+        image_write.result()
+        return DicomConvertedData(
+            output_image_filepath, input_file.name, output_dataset_filepath)
     except (FileNotFoundError,
             InvalidDicomError,
             PermissionError,
@@ -138,35 +438,77 @@ def convert_dicom_to_data(input_file, remove_dicom_fields, converted_data):
         raise error
 
 
-def dicom2json(input_files, remove_dicom_fields):
+def _init_worker_logging(log_queue):
+    """_init_worker_logging
+    Send worker process logs to the main process, which is the only one
+    writing them: RotatingFileHandler rotation is not safe across processes
+
+    Arguments:
+        log_queue {Queue} -- Queue read by the main process QueueListener
+    """
+    root_logger = logging.getLogger()
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+        handler.close()
+    root_logger.addHandler(QueueHandler(log_queue))
+
+
+def dicom2json(input_files, remove_dicom_tags,
+               png_compression=DEFAULT_PNG_COMPRESSION,
+               keep_dicom_tags=None,
+               png_backend=DEFAULT_PNG_BACKEND,
+               image_format=DEFAULT_IMAGE_FORMAT):
     """
     Convert DICOM file to JSON using pydicom library
 
     Arguments:
         input_files {str} -- DICOM files location
-        remove_dicom_fields {list} -- DICOM field name to not save in JSON
+        remove_dicom_tags {dict} -- DICOM field name by tag, to not save in JSON
+        png_compression {int} -- PNG compression level, from 0 to 9
+        keep_dicom_tags {list} -- Only DICOM tags read from the files, all if None
+        png_backend {str} -- PNG encoder, one of PNG_BACKENDS
+        image_format {str} -- Image file format, one of IMAGE_FORMATS
     """
     try:
-        converted_data = []
-        for input_file in input_files:
-            logger.debug("Convert %s", str(input_file.resolve()))
-            convert_dicom_to_data(
-                input_file, remove_dicom_fields, converted_data)
+        # Each file is independent, so parsing and writing are spread over
+        # all cores. Workers only send back DicomConvertedData items.
+        # The executor default worker count is used (capped on Windows),
+        # unless there are fewer files than cores
+        max_workers = None
+        if len(input_files) < (os.cpu_count() or 1):
+            max_workers = max(1, len(input_files))
+        log_queue = multiprocessing.Queue()
+        log_listener = QueueListener(log_queue, *logging.getLogger().handlers,
+                                     respect_handler_level=True)
+        log_listener.start()
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers,
+                                     initializer=_init_worker_logging,
+                                     initargs=(log_queue,)) as executor:
+                converted_data = list(executor.map(
+                    partial(convert_dicom_to_data,
+                            remove_dicom_tags=remove_dicom_tags,
+                            png_compression=png_compression,
+                            keep_dicom_tags=keep_dicom_tags,
+                            png_backend=png_backend,
+                            image_format=image_format),
+                    input_files,
+                    chunksize=4))
+        finally:
+            log_listener.stop()
 
         output_template_filepath = (DEFAULT_OUTPUT_DIR / Path("_dicom2json")).with_suffix(
             JsonConstants.SUFFIX.value)
 
         # Write template file
-        converted_data_json_object = []
-        for data in converted_data:
-            converted_data_json_object.append({
-                JsonConstants.TEMPLATE.value: data.template,
-                JsonConstants.IMAGE.value: data.image,
-                JsonConstants.OUTPUT.value: data.output
-            })
-        dicom_json_template_file = open(output_template_filepath, "w")
-        dicom_json_template_file.write(
-            my_json_dumps(converted_data_json_object))
+        dicom_json_template_file = open(output_template_filepath, "wb",
+                                        buffering=JSON_WRITE_BUFFER_SIZE)
+        write_json_array(dicom_json_template_file,
+                         ({
+                             JsonConstants.TEMPLATE.value: data.template,
+                             JsonConstants.IMAGE.value: data.image,
+                             JsonConstants.OUTPUT.value: data.output
+                         } for data in converted_data))
         dicom_json_template_file.close()
 
         logger.debug("Output files for have been writed at: '%s'",
@@ -207,10 +549,77 @@ def main():
         type=str,
         help=remove_dicom_fields_help,
         default=None)
+    keep_dicom_fields_help = "only read and extract these DICOM fields, the \
+        others are never parsed. Fields needed for the image ({}) are always \
+            read. Possible values are the same as for '--remove_dicom_fields'.".format(
+        ", ".join(IMAGE_DICOM_FIELDS))
+    parser.add_argument(
+        "-kdf",
+        "--keep_dicom_fields",
+        nargs='+',
+        type=str,
+        help=keep_dicom_fields_help,
+        default=None)
+    png_compression_help = "PNG compression level, from 0 (fastest, biggest \
+        files) to 9 (slowest, smallest files). Default: {}".format(DEFAULT_PNG_COMPRESSION)
+    parser.add_argument(
+        "-pc",
+        "--png-compression",
+        type=int,
+        choices=range(10),
+        metavar="{0..9}",
+        help=png_compression_help,
+        default=DEFAULT_PNG_COMPRESSION)
+    png_backend_help = "PNG encoder. 'fpnge' is much faster but must be \
+        installed, it ignores '--png-compression' and only supports 8 bits \
+            images, conversion aborts on other images. Default: {}".format(DEFAULT_PNG_BACKEND)
+    parser.add_argument(
+        "-pb",
+        "--png-backend",
+        type=str,
+        choices=PNG_BACKENDS,
+        help=png_backend_help,
+        default=DEFAULT_PNG_BACKEND)
+    image_format_help = "image file format. 'npy-lz4' is a LZ4 compressed \
+        numpy array, much faster to write than PNG but only readable with \
+            numpy and json2dicom.py. Default: {}".format(DEFAULT_IMAGE_FORMAT)
+    parser.add_argument(
+        "-f",
+        "--format",
+        type=str,
+        choices=IMAGE_FORMATS,
+        help=image_format_help,
+        default=DEFAULT_IMAGE_FORMAT)
 
     args = parser.parse_args()
     input_files = args.input_files
     remove_dicom_fields = args.remove_dicom_fields
+    keep_dicom_fields = args.keep_dicom_fields
+    png_compression = args.png_compression
+    png_backend = args.png_backend
+    if png_backend == "fpnge" and not fpnge:
+        png_backend_error = "'fpnge' PNG backend is not installed, abort dicom2json execution!"
+        raise ValueError(png_backend_error)
+    image_format = args.format
+    if image_format == "npy-lz4" and not lz4:
+        image_format_error = "'lz4' package is needed by 'npy-lz4' image format, abort dicom2json execution!"
+        raise ValueError(image_format_error)
+
+    # Resolve DICOM field names to tags once, instead of once per file
+    remove_dicom_tags = dicom_fields_to_tags(remove_dicom_fields)
+    keep_dicom_tags = None
+    if keep_dicom_fields:
+        # Removed fields are not read at all, except the image ones
+        keep_dicom_tags = set(dicom_fields_to_tags(
+            keep_dicom_fields)) - set(remove_dicom_tags)
+        keep_dicom_tags |= set(dicom_fields_to_tags(IMAGE_DICOM_FIELDS))
+        remove_dicom_tags = {dicom_tag: dicom_field_name
+                             for dicom_tag, dicom_field_name in remove_dicom_tags.items()
+                             if dicom_tag in keep_dicom_tags}
+        # dcmread ignores plain int entries in specific_tags, only keeps
+        # keywords and BaseTag ones
+        keep_dicom_tags = [Tag(dicom_tag)
+                           for dicom_tag in sorted(keep_dicom_tags)]
 
     files = []
     for input_file in input_files:
@@ -222,15 +631,20 @@ def main():
         if input_filepath.is_file():
             files.append(input_filepath)
         elif input_filepath.is_dir():
-            files.extend(list(input_filepath.glob(
-                '*' + DicomConstants.SUFFIX.value)))
+            # Directory entries names are enough, no stat() per file
+            dicom_suffix = DicomConstants.SUFFIX.value
+            with os.scandir(input_filepath) as dir_entries:
+                files.extend(Path(dir_entry.path) for dir_entry in dir_entries
+                             if dir_entry.name.endswith(dicom_suffix)
+                             and dir_entry.is_file())
         else:
             input_is_not_file_error = "{} is not a file, abort dicom2json execution!".format(
                 input_filepath)
             raise ValueError(input_is_not_file_error)
 
     try:
-        dicom2json(files, remove_dicom_fields)
+        dicom2json(files, remove_dicom_tags, png_compression,
+                   keep_dicom_tags, png_backend, image_format)
     except Exception as error:
         raise error
 
@@ -4,22 +4,42 @@ import argparse
 import json
 from pathlib import Path
 import logging
-from logging import config
-import yaml
 import cv2
+import numpy as np
 from pydicom.dataset import Dataset, FileDataset
-from constants import DicomConstants, JsonConstants, PngConstants
+from constants import DicomConstants, JsonConstants, NpyLz4Constants, PngConstants
+from logger_config import load_logger_config
+try:
+    # Optional, needed to read 'npy-lz4' images from dicom2json.py
+    import lz4.frame
+except ImportError:
+    lz4 = None
 
 DEFAULT_OUTPUT_DIR = Path(__file__).parent / Path("output")
 
 # Load logger configuration from YAML file
-with open(Path(__file__).parent / Path("logger_config.yaml"), 'rt') as f:
-    config_data = yaml.safe_load(f.read())
-    config.dictConfig(config_data)
+load_logger_config()
 # Get basic logger
 logger = logging.getLogger('root')
 
 
+def unshuffle_bytes(image):
+    """unshuffle_bytes
+    Rebuild an image from the byte planes written by dicom2json.py
+
+    Args:
+        image (ndarray): uint8 byte planes with shape (itemsize, rows, columns),
+                         or 8 bits image with shape (rows, columns)
+
+    Returns:
+        ndarray: Image with shape (rows, columns)
+    """
+    if image.ndim < 3:
+        return image
+    return np.ascontiguousarray(image.transpose(1, 2, 0)).view(
+        "<u{}".format(image.shape[0]))[..., 0]
+
+
 def convert_data_to_dicom(input_filepath, input_json):
     """
     Convert data available in input_json to DICOM file
@@ -46,7 +66,7 @@ def convert_data_to_dicom(input_filepath, input_json):
             template_filepath)
         raise ValueError(template_is_not_file)
 
-    template_file = open(template_filepath, "r")
+    template_file = open(template_filepath, "r", encoding="utf-8")
     current_json = json.loads(template_file.read())
 
     # Override template object if 'data' key is present
@@ -102,8 +122,16 @@ def convert_data_to_dicom(input_filepath, input_json):
                     image_filepath)
                 raise ValueError(image_is_not_file)
 
-            image = cv2.imread(str(image_filepath),
-                               flags=cv2.IMREAD_UNCHANGED)
+            if image_filepath.name.endswith(NpyLz4Constants.SUFFIX.value):
+                if not lz4:
+                    lz4_error = "'lz4' package is needed to read '{}', abort json2dicom execution!".format(
+                        image_filepath)
+                    raise ValueError(lz4_error)
+                with lz4.frame.open(str(image_filepath), "rb") as image_file:
+                    image = unshuffle_bytes(np.load(image_file))
+            else:
+                image = cv2.imread(str(image_filepath),
+                                   flags=cv2.IMREAD_UNCHANGED)
             shape = image.shape
             bit_depth = None
             if len(shape) < 3:
@@ -146,7 +174,7 @@ def json2dicom(input_filepath):
         error: Error encountered during conversion
     """
     try:
-        input_file = open(input_filepath, "r")
+        input_file = open(input_filepath, "r", encoding="utf-8")
         input_json = json.loads(input_file.read())
 
         if isinstance(input_json, list):
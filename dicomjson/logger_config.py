@@ -0,0 +1,57 @@
+"""logger_config
+Load logger configuration for scripts
+"""
+
+from logging import config
+import os
+from pathlib import Path
+import pickle
+import tempfile
+import yaml
+try:
+    # LibYAML parser, much faster than the pure Python one
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+LOGGER_CONFIG_FILEPATH = Path(__file__).parent / Path("logger_config.yaml")
+# Parsed configuration, reused while the YAML file is not modified.
+# pickle.load runs whatever this file contains: it is trusted like the
+# scripts next to it, anyone able to write it can already edit them
+LOGGER_CONFIG_CACHE_FILEPATH = LOGGER_CONFIG_FILEPATH.with_suffix(".pickle")
+
+
+def load_logger_config():
+    """load_logger_config
+    Configure logging from the YAML file, using the parsed
+    configuration cache when it is up to date
+    """
+    config_mtime = os.stat(LOGGER_CONFIG_FILEPATH).st_mtime_ns
+    config_data = None
+    try:
+        with open(LOGGER_CONFIG_CACHE_FILEPATH, 'rb') as cache_file:
+            cache_mtime, cache_data = pickle.load(cache_file)
+        if cache_mtime == config_mtime:
+            config_data = cache_data
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError, TypeError):
+        pass
+
+    if config_data is None:
+        with open(LOGGER_CONFIG_FILEPATH, 'rt') as f:
+            config_data = yaml.load(f, Loader=SafeLoader)
+        # Several processes may load the configuration at once (process
+        # pool workers re-import the scripts with the spawn start method),
+        # so the cache is written to a temporary file then moved in place
+        cache_filepath = None
+        try:
+            cache_fd, cache_filepath = tempfile.mkstemp(
+                dir=LOGGER_CONFIG_CACHE_FILEPATH.parent, suffix=".tmp")
+            with os.fdopen(cache_fd, 'wb') as cache_file:
+                pickle.dump((config_mtime, config_data), cache_file)
+            os.replace(cache_filepath, LOGGER_CONFIG_CACHE_FILEPATH)
+        except OSError:
+            # Read-only install, YAML file will be parsed each time
+            if cache_filepath and os.path.exists(cache_filepath):
+                os.remove(cache_filepath)
+
+    config.dictConfig(config_data)